@@ -8,11 +8,31 @@ degli header generati dal gestionale.
 
 from __future__ import annotations
 
-import re
+import string
+from collections import Counter
+from functools import lru_cache
 from typing import Dict, IO, Optional
 
 import pandas as pd
 
+
+def _select_excel_engine() -> str:
+    """Sceglie il motore di lettura XLSX più veloce disponibile.
+
+    ``python-calamine`` (parser in Rust) è supportato da pandas a partire dalla
+    versione 2.2; se non è installato o pandas è più vecchio si ripiega su
+    ``openpyxl``.
+    """
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    major, minor = (int(part) for part in pd.__version__.split(".")[:2])
+    return "calamine" if (major, minor) >= (2, 2) else "openpyxl"
+
+
+_EXCEL_ENGINE = _select_excel_engine()
+
 # Dizionario di mapping tra nomi interni e possibili varianti delle colonne
 _COLUMN_SYNONYMS: Dict[str, list[str]] = {
     "customer_code": ["codicecliente", "codiceclientefornitore", "cliente"],
@@ -69,21 +89,55 @@ _COLUMN_SYNONYMS: Dict[str, list[str]] = {
 }
 
 
+class _NormalizeTable(dict):
+    """Tabella per ``str.translate`` che elimina ogni carattere non previsto.
+
+    Le lettere ``a-z`` e le cifre restano invariate, le vocali accentate comuni
+    vengono ricondotte alla forma senza accento e qualsiasi altro carattere
+    (spazi, punteggiatura, simboli) viene rimosso. I codici non presenti sono
+    memorizzati alla prima occorrenza, così le chiamate successive restano
+    semplici lookup.
+    """
+
+    def __missing__(self, code: int) -> None:
+        self[code] = None
+        return None
+
+
+_NORMALIZE_TABLE = _NormalizeTable(
+    {ord(ch): ch for ch in string.ascii_lowercase + string.digits}
+)
+_NORMALIZE_TABLE.update(str.maketrans("àèéìòù", "aeeiou"))
+
+
+@lru_cache(maxsize=1024)
 def _normalize_column_name(name: str) -> str:
     """Elimina caratteri speciali e converte in minuscolo una stringa."""
-    name = name.lower()
-    # Rimuove accenti comuni
-    name = (
-        name.replace("à", "a").replace("è", "e").replace("é", "e")
-        .replace("ì", "i").replace("ò", "o").replace("ù", "u")
-    )
-    # Rimuove spazi e caratteri non alfanumerici
-    return re.sub(r"[^a-z0-9]", "", name)
+    # Minuscolo, rimozione accenti comuni e dei caratteri non alfanumerici in
+    # un unico passaggio di ``str.translate``
+    return name.lower().translate(_NORMALIZE_TABLE)
+
 
+# Indice inverso sinonimo normalizzato -> nome interno, costruito una sola volta
+# all'import. In caso di sinonimi uguali dopo la normalizzazione prevale il primo
+# nome interno dichiarato in ``_COLUMN_SYNONYMS``.
+_SYN_TO_INTERNAL: Dict[str, str] = {}
+for _internal, _synonyms in _COLUMN_SYNONYMS.items():
+    for _syn in _synonyms:
+        _SYN_TO_INTERNAL.setdefault(_normalize_column_name(_syn), _internal)
+del _internal, _synonyms, _syn
 
+
+@lru_cache(maxsize=1024)
 def _find_internal_name(external: str) -> Optional[str]:
     """Trova il nome interno corrispondente a un header proveniente dal file.
 
+    Il confronto è esatto sul nome normalizzato. Un riconoscimento per prefisso
+    non è adatto a questo dizionario: sinonimi brevi come ``rc``, ``dap`` o
+    ``codice`` catturerebbero colonne diverse (es. ``codicefornitore``).
+    Eventuali strategie più tolleranti vanno aggiunte qui, unico punto di
+    chiamata.
+
     Args:
         external: Il nome di colonna originale.
 
@@ -91,39 +145,45 @@ def _find_internal_name(external: str) -> Optional[str]:
         Il nome canonico utilizzato internamente oppure ``None`` se non è stato
         riconosciuto.
     """
-    clean = _normalize_column_name(external)
-    for internal, synonyms in _COLUMN_SYNONYMS.items():
-        for syn in synonyms:
-            if clean == _normalize_column_name(syn):
-                return internal
-    return None
+    return _SYN_TO_INTERNAL.get(_normalize_column_name(external))
 
 
-def read_sales_excel(file: IO[bytes]) -> pd.DataFrame:
+def read_sales_excel(file: IO[bytes], engine: Optional[str] = None) -> pd.DataFrame:
     """Legge un file Excel proveniente da SAP B1 e normalizza i nomi delle colonne.
 
     Args:
         file: Oggetto file-like in modalità binaria.
+        engine: Motore di lettura: ``"calamine"`` oppure ``"openpyxl"``. Se
+            ``None`` si usa il più veloce disponibile, scelto all'importazione
+            del modulo.
 
     Returns:
         Un DataFrame con i nomi delle colonne normalizzati secondo il
         dizionario ``_COLUMN_SYNONYMS``. Le colonne non riconosciute vengono
         mantenute con il loro nome originale.
     """
-    # Legge il file utilizzando pandas; openpyxl è richiesto per XLSX
-    df = pd.read_excel(file, engine="openpyxl")
+    # Legge il file utilizzando calamine se disponibile, altrimenti openpyxl. Il
+    # motore openpyxl di pandas apre già il workbook con ``read_only=True`` e
+    # ``data_only=True``, e gestisce intestazioni duplicate (``X``, ``X.1``) e
+    # dimensioni del foglio errate.
+    if engine is None:
+        engine = _EXCEL_ENGINE
+    if engine == "calamine":
+        df = pd.read_excel(file, engine="calamine")
+    elif engine == "openpyxl":
+        df = pd.read_excel(file, engine="openpyxl")
+    else:
+        raise ValueError(f"Motore di lettura non supportato: {engine!r}")
     # Mappa le colonne ai nomi canonici quando possibile
     new_columns: Dict[str, str] = {}
+    seen: Counter[str] = Counter()
     for col in df.columns:
         internal = _find_internal_name(col)
         if internal:
             # Se sono presenti più colonne con lo stesso nome interno, aggiungi un suffisso
-            if internal in new_columns.values():
-                # Conteggia quante volte appare già
-                count = list(new_columns.values()).count(internal)
-                new_columns[col] = f"{internal}_{count+1}"
-            else:
-                new_columns[col] = internal
+            seen[internal] += 1
+            count = seen[internal]
+            new_columns[col] = internal if count == 1 else f"{internal}_{count}"
         else:
             new_columns[col] = _normalize_column_name(col)
     df = df.rename(columns=new_columns)
@@ -10,9 +10,16 @@ from __future__ import annotations
 
 import re
 from datetime import date, datetime
+from functools import lru_cache
 from typing import Optional, Tuple
 
+# Date nel formato dd.mm.yy o dd.mm.yyyy
+_DATE_RE = re.compile(r"\b\d{2}\.\d{2}\.\d{2,4}\b")
+# Separatori da normalizzare in spazi prima della ricerca delle date
+_SEP_TRANS = str.maketrans({"_": " ", "-": " ", "/": " "})
 
+
+@lru_cache(maxsize=256)
 def _parse_single_date(token: str) -> Optional[date]:
     """Converte una stringa nel formato ``DD.MM.YY`` o ``DD.MM.YYYY`` in un oggetto ``date``.
 
@@ -46,9 +53,9 @@ def extract_period_from_filename(filename: str) -> Tuple[Optional[date], Optiona
         entrambi gli elementi saranno ``None``.
     """
     # Normalizza eventuali caratteri di separazione (underscore, trattini)
-    clean = filename.replace("_", " ").replace("-", " ").replace("/", " ")
+    clean = filename.translate(_SEP_TRANS)
     # Ricerca di tutte le date nel formato dd.mm.yy o dd.mm.yyyy
-    tokens = re.findall(r"\b\d{2}\.\d{2}\.\d{2,4}\b", clean)
+    tokens = _DATE_RE.findall(clean)
     dates: list[date] = []
     for token in tokens:
         parsed = _parse_single_date(token)
@@ -2,20 +2,507 @@
 
 Questo modulo contiene funzioni per esportare i risultati dei calcoli di
 riordino in file Excel (un workbook completo con diversi fogli e un workbook
-separato con un foglio per ciascun fornitore) e per creare un template CSV
-contenente le anagrafiche dei fornitori da arricchire con informazioni
-supplementari come codici fornitore, MOQ e lead time.
+separato con un foglio per ciascun fornitore, oppure un unico workbook che li
+riunisce) e per creare un template CSV contenente le anagrafiche dei fornitori
+da arricchire con informazioni supplementari come codici fornitore, MOQ e lead
+time.
 """
 
 from __future__ import annotations
 
+import csv
+import io
+import math
+import os
+import re
+import zipfile
 from pathlib import Path
-from typing import Optional
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Union
+from xml.sax.saxutils import escape, quoteattr
 
+import numpy as np
 import pandas as pd
 
+try:
+    import xlsxwriter
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    # In assenza di xlsxwriter si usa openpyxl in modalità ``write_only``
+    xlsxwriter = None
 
-def generate_analysis_xlsx(df: pd.DataFrame, output_path: str) -> str:
+# Destinazione di un report: un percorso su disco oppure un oggetto file-like
+# binario (ad esempio ``io.BytesIO``) per generare il file direttamente in memoria
+_Output = Union[str, "os.PathLike[str]", IO[bytes]]
+
+
+def _resolve_output(output: _Output) -> Union[Path, IO[bytes]]:
+    """Normalizza la destinazione: ``Path`` per i percorsi, invariata se file-like."""
+    if isinstance(output, (str, os.PathLike)):
+        return Path(output)
+    return output
+
+
+def _output_result(target: Union[Path, IO[bytes]]) -> Union[str, IO[bytes]]:
+    """Valore restituito dai generatori: il percorso come stringa o l'oggetto ricevuto."""
+    return str(target) if isinstance(target, Path) else target
+
+
+# Stile dell'intestazione equivalente a quello applicato da ``DataFrame.to_excel``
+_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+# Traduzione in italiano dei nomi delle colonne per i fogli esportati
+_COL_MAP = {
+    "product_code": "Codice articolo",
+    "product_description": "Descrizione articolo",
+    "vendor_name": "Fornitore",
+    "qty_to_order": "Quantità da ordinare",
+    "qty_shipped_period": "Quantità spedita (periodo)",
+    "qty_ordered_period": "Quantità ordinata (periodo)",
+    "qty_already_ordered_suppliers": "Quantità ordinata ai fornitori",
+    "qty_committed_open_customer_orders": "Quantità ordinata dai clienti",
+    "stock_on_hand_total": "Giacenza totale",
+    "avg_sales_last_6_months": "Media vendite 6 mesi",
+    "pack_size": "Pezzi collo/scatola",
+    "daily_demand": "Domanda giornaliera",
+    "safety_stock_qty": "Scorta di sicurezza",
+    "reorder_point": "Punto di riordino",
+    "target_level": "Livello target",
+    "projected_available": "Disponibilità proiettata",
+    "coverage_days": "Giorni di copertura",
+    "relevance_score": "Punteggio rilevanza",
+}
+
+
+# Righe convertite in oggetti Python per volta durante la scrittura dei fogli
+_ROW_CHUNK = 10_000
+
+
+def _iter_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    """Restituisce le righe di ``df`` come tuple, con i valori mancanti a ``None``.
+
+    La conversione a oggetti Python avviene a blocchi di ``_ROW_CHUNK`` righe:
+    la memoria aggiuntiva resta limitata al blocco corrente invece di una copia
+    dell'intero foglio.
+    """
+    for start in range(0, len(df), _ROW_CHUNK):
+        chunk = df.iloc[start:start + _ROW_CHUNK]
+        # I valori mancanti diventano celle vuote, come con ``to_excel``
+        values = chunk.astype(object).where(chunk.notna(), None)
+        yield from values.itertuples(index=False, name=None)
+
+
+class _Workbook:
+    """Workbook XLSX in sola scrittura, con i fogli emessi riga per riga.
+
+    Usa xlsxwriter quando disponibile. In modalità ``constant_memory`` ogni
+    riga viene scritta su disco non appena si passa alla successiva e le righe
+    vengono convertite a blocchi (``_iter_rows``), quindi la memoria occupata
+    non cresce con la dimensione del foglio; le righe devono però essere
+    scritte in ordine, motivo per cui i fogli non passano da
+    ``DataFrame.to_excel`` (che procede per colonne). La modalità standard conserva invece le celle in memoria ma
+    usa la tabella delle stringhe condivise, vantaggiosa quando molti fogli
+    piccoli ripetono gli stessi testi.
+
+    Se xlsxwriter non è installato si ripiega su ``openpyxl.Workbook`` con
+    ``write_only=True``, che a sua volta accoda le righe in streaming senza
+    costruire l'albero delle celle in memoria.
+
+    Args:
+        path: Percorso del file da creare oppure oggetto file-like binario.
+        constant_memory: Se ``True`` abilita lo streaming riga per riga
+            (solo xlsxwriter; openpyxl in ``write_only`` procede sempre così).
+    """
+
+    def __init__(self, path: Union[Path, IO[bytes]], *, constant_memory: bool = True) -> None:
+        self._path = path
+        if xlsxwriter is not None:
+            self._book = xlsxwriter.Workbook(
+                str(path) if isinstance(path, Path) else path,
+                {"constant_memory": constant_memory, "nan_inf_to_errors": True}
+            )
+            self._header_format = self._book.add_format(_HEADER_FORMAT)
+        else:
+            import openpyxl
+            from openpyxl.styles import Alignment, Border, Font, Side
+
+            self._book = openpyxl.Workbook(write_only=True)
+            thin = Side(style="thin")
+            self._header_style = {
+                "font": Font(bold=True),
+                "border": Border(left=thin, right=thin, top=thin, bottom=thin),
+                "alignment": Alignment(horizontal="center", vertical="top"),
+            }
+
+    def __enter__(self) -> "_Workbook":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Completa e salva il file."""
+        if xlsxwriter is not None:
+            self._book.close()
+        else:
+            self._book.save(self._path)
+
+    def add_sheet(self, sheet_name: str, df: Optional[pd.DataFrame] = None) -> None:
+        """Aggiunge un foglio con il contenuto di ``df`` (vuoto se ``None``).
+
+        Args:
+            sheet_name: Nome del nuovo foglio.
+            df: Dati da esportare; l'indice non viene scritto.
+        """
+        if xlsxwriter is not None:
+            worksheet = self._book.add_worksheet(sheet_name)
+        else:
+            worksheet = self._book.create_sheet(sheet_name)
+        if df is None or df.columns.empty:
+            return
+        rows = _iter_rows(df)
+        if xlsxwriter is not None:
+            worksheet.write_row(0, 0, list(df.columns), self._header_format)
+            for row_idx, row in enumerate(rows, start=1):
+                worksheet.write_row(row_idx, 0, row)
+        else:
+            from openpyxl.cell import WriteOnlyCell
+
+            header = []
+            for name in df.columns:
+                cell = WriteOnlyCell(worksheet, value=name)
+                cell.font = self._header_style["font"]
+                cell.border = self._header_style["border"]
+                cell.alignment = self._header_style["alignment"]
+                header.append(cell)
+            worksheet.append(header)
+            for row in rows:
+                worksheet.append(row)
+
+
+# Parti fisse del pacchetto XLSX scritto da ``_InlineXlsxWorkbook``
+_XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XLSX_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{_XLSX_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+# Stile 0 predefinito, stile 1 per l'intestazione (grassetto, bordo sottile, centrato)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{_XLSX_MAIN_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/>'
+    '<bottom style="thin"/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" '
+    'applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>'
+    "</cellXfs>"
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+# Caratteri non ammessi in XML 1.0 e nei nomi dei fogli Excel
+_XML_ILLEGAL_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_NAME_ILLEGAL_RE = re.compile(r"[\[\]:*?/\\]")
+
+
+def _column_letter(idx: int) -> str:
+    """Converte un indice di colonna (0 = ``A``) nella lettera Excel."""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _xml_cell(ref: str, value: Any, style: str = "") -> str:
+    """Restituisce l'XML di una cella; stringa vuota per valori mancanti."""
+    if value is None:
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        if not math.isfinite(value):
+            return ""
+        return f'<c r="{ref}"{style}><v>{float(value):.16G}</v></c>'
+    text = escape(_XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _InlineXlsxWorkbook:
+    """Scrive direttamente l'XML di un file XLSX, senza librerie Excel.
+
+    Ogni foglio viene generato come testo a partire dalle tuple di
+    ``itertuples`` e compresso nell'archivio ZIP man mano che viene prodotto;
+    le stringhe sono inserite inline (``inlineStr``), quindi non serve tenere
+    in memoria una tabella di stringhe condivise. Per molti fogli di poche
+    righe il costo per cella è molto inferiore a quello delle API di
+    xlsxwriter/openpyxl. Espone la stessa interfaccia di ``_Workbook``.
+
+    Args:
+        path: Percorso del file da creare oppure oggetto file-like binario.
+    """
+
+    def __init__(self, path: Union[Path, IO[bytes]]) -> None:
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet_names: List[str] = []
+
+    def __enter__(self) -> "_InlineXlsxWorkbook":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Scrive workbook, relazioni e content types e chiude l'archivio."""
+        count = len(self._sheet_names)
+        sheets = "".join(
+            f'<sheet name={quoteattr(name)} sheetId="{idx}" r:id="rId{idx}"/>'
+            for idx, name in enumerate(self._sheet_names, start=1)
+        )
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{_XLSX_MAIN_NS}" xmlns:r="{_XLSX_REL_NS}">'
+            f"<sheets>{sheets}</sheets></workbook>",
+        )
+        rels = "".join(
+            f'<Relationship Id="rId{idx}" Type="{_XLSX_REL_NS}/worksheet" '
+            f'Target="worksheets/sheet{idx}.xml"/>'
+            for idx in range(1, count + 1)
+        )
+        rels += (
+            f'<Relationship Id="rId{count + 1}" Type="{_XLSX_REL_NS}/styles" '
+            'Target="styles.xml"/>'
+        )
+        self._zip.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{_XLSX_PKG_REL_NS}">{rels}</Relationships>',
+        )
+        self._zip.writestr("xl/styles.xml", _XLSX_STYLES)
+        self._zip.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        sheet_types = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{idx}.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for idx in range(1, count + 1)
+        )
+        self._zip.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{sheet_types}</Types>",
+        )
+        self._zip.close()
+
+    def add_sheet(self, sheet_name: str, df: Optional[pd.DataFrame] = None) -> None:
+        """Aggiunge un foglio con il contenuto di ``df`` (vuoto se ``None``).
+
+        Args:
+            sheet_name: Nome del nuovo foglio (massimo 31 caratteri, senza
+                ``[]:*?/\\``).
+            df: Dati da esportare; l'indice non viene scritto.
+
+        Raises:
+            ValueError: Se il nome del foglio non è valido per Excel.
+        """
+        if not sheet_name or len(sheet_name) > 31 or _SHEET_NAME_ILLEGAL_RE.search(sheet_name):
+            raise ValueError(f"Nome foglio non valido per Excel: {sheet_name!r}")
+        self._sheet_names.append(sheet_name)
+        part = f"xl/worksheets/sheet{len(self._sheet_names)}.xml"
+        with self._zip.open(part, "w") as fh:
+            fh.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{_XLSX_MAIN_NS}"><sheetData>'.encode("utf-8")
+            )
+            if df is not None and not df.columns.empty:
+                letters = [_column_letter(idx) for idx in range(len(df.columns))]
+                header = "".join(
+                    _xml_cell(f"{col}1", name, ' s="1"') for col, name in zip(letters, df.columns)
+                )
+                fh.write(f'<row r="1">{header}</row>'.encode("utf-8"))
+                for row_idx, row in enumerate(_iter_rows(df), start=2):
+                    cells = "".join(
+                        _xml_cell(f"{col}{row_idx}", value) for col, value in zip(letters, row)
+                    )
+                    fh.write(f'<row r="{row_idx}">{cells}</row>'.encode("utf-8"))
+            fh.write(b"</sheetData></worksheet>")
+
+
+def _vendor_sheet_names(
+    vendors: Iterable[Any], reserved: Iterable[str] = ()
+) -> Dict[Any, str]:
+    """Associa a ciascun fornitore un nome di foglio Excel valido e univoco.
+
+    Excel non ammette nei nomi i caratteri ``[]:*?/\\`` (sostituiti da ``_``)
+    né apostrofi in testa o in coda (rimossi), li limita a 31 caratteri e non
+    ammette duplicati (senza distinzione tra maiuscole e minuscole): se il
+    troncamento produce una collisione, il nome viene accorciato e completato
+    con un suffisso numerico.
+
+    Args:
+        vendors: Fornitori distinti, nell'ordine di emissione dei fogli.
+        reserved: Nomi di fogli già occupati nel workbook.
+
+    Returns:
+        Dizionario fornitore -> nome del foglio.
+    """
+    vendor_to_sheet: Dict[Any, str] = {}
+    used_names = {name.lower() for name in reserved}
+    for vendor in vendors:
+        name = _SHEET_NAME_ILLEGAL_RE.sub("_", vendor)[:31].strip("'") if isinstance(vendor, str) else ""
+        base_name = sheet_name = name or "Senza_nome"
+        suffix = 1
+        while sheet_name.lower() in used_names:
+            suffix += 1
+            sheet_name = f"{base_name[:31 - len(str(suffix)) - 1]}_{suffix}"
+        used_names.add(sheet_name.lower())
+        vendor_to_sheet[vendor] = sheet_name
+    return vendor_to_sheet
+
+
+def _orders_subset(df: pd.DataFrame, orders_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Righe da ordinare: quelle passate dal chiamante oppure ``qty_to_order > 0``."""
+    # La maschera serve solo se il chiamante non le ha già filtrate
+    if orders_df is not None:
+        return orders_df
+    return df.iloc[df["qty_to_order"].to_numpy() > 0]
+
+
+def _sort_by_key(frame: pd.DataFrame) -> pd.DataFrame:
+    """Ordina le righe per codice articolo e fornitore, come ``groupby`` ordinato.
+
+    ``compute_reorder`` restituisce i gruppi nell'ordine di prima apparizione
+    nel file. Le chiavi vengono ordinate con ``pd.factorize(sort=True)``, che
+    come ``groupby`` tollera codici misti (numeri e testo), dove
+    ``sort_values`` solleverebbe ``TypeError``.
+    """
+    product_ids = pd.factorize(frame["product_code"], sort=True)[0]
+    vendor_ids = pd.factorize(frame["vendor_name"], sort=True)[0]
+    return frame.iloc[np.lexsort((vendor_ids, product_ids))]
+
+
+def _write_analysis_sheets(
+    workbook: Any, df: pd.DataFrame, orders: pd.DataFrame
+) -> None:
+    """Scrive nel workbook i fogli di analisi descritti in ``generate_analysis_xlsx``.
+
+    Args:
+        workbook: Workbook di destinazione (``_Workbook`` o ``_InlineXlsxWorkbook``).
+        df: DataFrame risultante da ``compute_reorder``.
+        orders: Righe di ``df`` con ``qty_to_order > 0``.
+    """
+    # I fogli di dettaglio elencano le righe per articolo e fornitore
+    df = _sort_by_key(df)
+    orders = _sort_by_key(orders)
+    # Calcola una sola volta le maschere dei fogli filtrati, leggendo ogni
+    # colonna coinvolta direttamente come array NumPy
+    projected = df["projected_available"].to_numpy()
+    reorder_point = df["reorder_point"].to_numpy()
+    daily_demand = df["daily_demand"].to_numpy()
+    pack_size = df["pack_size"].to_numpy()
+    mask_near = projected < reorder_point
+    mask_exceptions = (daily_demand <= 0) | (pack_size <= 0)
+    # Tutti i fogli di dettaglio sono sottoinsiemi di righe di ``df`` con le
+    # stesse colonne: basta una sola mappa di rinomina
+    rename_map = {k: v for k, v in _COL_MAP.items() if k in df.columns}
+    # Rinominare colonne per ordini suggeriti
+    workbook.add_sheet("Ordini_suggeriti", orders.rename(columns=rename_map))
+    # Dettaglio completo
+    workbook.add_sheet("Dettaglio_calcoli", df.rename(columns=rename_map))
+    # Riepilogo per fornitore
+    if not orders.empty:
+        # ``size`` conta le righe senza leggere i valori: ``qty_to_order`` è
+        # intera e non contiene NaN, quindi coincide con ``count``
+        by_vendor = orders.groupby("vendor_name")["qty_to_order"]
+        summary = pd.DataFrame(
+            {"num_sku": by_vendor.size(), "total_qty": by_vendor.sum()}
+        ).reset_index()
+    else:
+        summary = pd.DataFrame(
+            {"vendor_name": [], "num_sku": [], "total_qty": []}
+        )
+    # Rinominare anche il riepilogo
+    summary = summary.rename(columns={
+        "vendor_name": "Fornitore",
+        "num_sku": "Numero articoli",
+        "total_qty": "Quantità totale da ordinare",
+    })
+    workbook.add_sheet("Riepilogo_fornitori", summary)
+    # Vicini al riordino: projected_available < reorder_point
+    workbook.add_sheet("Vicini_riordino", df.iloc[mask_near].rename(columns=rename_map))
+    # Eccezioni: daily_demand <= 0 o pack_size <= 0
+    workbook.add_sheet("Eccezioni", df.iloc[mask_exceptions].rename(columns=rename_map))
+
+
+def _write_vendor_sheets(
+    workbook: Any,
+    orders: pd.DataFrame,
+    sort_by: str,
+    reserved: Iterable[str] = (),
+) -> None:
+    """Scrive nel workbook un foglio per ciascun fornitore presente in ``orders``.
+
+    Args:
+        workbook: Workbook di destinazione (``_Workbook`` o ``_InlineXlsxWorkbook``).
+        orders: Righe da ordinare, non vuote.
+        sort_by: "alphabetical" oppure "relevance", come in
+            ``generate_orders_by_vendor_xlsx``.
+        reserved: Nomi di fogli già presenti nel workbook, da non riutilizzare.
+    """
+    # Ordina una sola volta tutte le righe e scorre i gruppi nell'ordine
+    # di prima apparizione (``sort=False``): le righe di ogni gruppo
+    # mantengono l'ordinamento, senza ordinare ciascun foglio a parte.
+    if sort_by == "relevance" and "relevance_score" in orders.columns:
+        # I fogli seguono la massima rilevanza del fornitore (hanno priorità i
+        # fornitori con almeno un articolo molto urgente), a parità in ordine
+        # alfabetico; le righe seguono la rilevanza discendente e, a parità di
+        # punteggio, il codice articolo per stabilità. Il massimo per fornitore
+        # viene affiancato a ogni riga con ``transform`` per un unico ordinamento.
+        vendor_max = orders.groupby("vendor_name", sort=False)["relevance_score"].transform("max")
+        orders_sorted = (
+            orders.assign(_vendor_max=vendor_max)
+            .sort_values(
+                by=["_vendor_max", "vendor_name", "relevance_score", "product_code"],
+                ascending=[False, True, False, True],
+            )
+            .drop(columns="_vendor_max")
+        )
+    else:
+        # Fornitori e, al loro interno, codici articolo in ordine alfabetico
+        orders_sorted = orders.sort_values(by=["vendor_name", "product_code"])
+    # Tutti i fogli condividono le stesse colonne: la mappa di rinomina
+    # (solo per le colonne presenti) si calcola una volta sola
+    rename_map = {k: v for k, v in _COL_MAP.items() if k in orders.columns}
+    # Nomi dei fogli calcolati una volta per fornitore, prima dell'emissione
+    vendor_to_sheet = _vendor_sheet_names(orders_sorted["vendor_name"].unique(), reserved)
+    # Genera un foglio per ciascun fornitore nell'ordine scelto
+    for vendor, subset in orders_sorted.groupby("vendor_name", sort=False):
+        workbook.add_sheet(vendor_to_sheet[vendor], subset.rename(columns=rename_map))
+
+
+def generate_analysis_xlsx(
+    df: pd.DataFrame,
+    output_path: _Output,
+    *,
+    orders_df: Optional[pd.DataFrame] = None,
+) -> Union[str, IO[bytes]]:
     """Esporta un workbook Excel con il dettaglio dei calcoli e i riepiloghi.
 
     Vengono creati diversi fogli:
@@ -33,81 +520,27 @@ def generate_analysis_xlsx(df: pd.DataFrame, output_path: str) -> str:
 
     Args:
         df: DataFrame risultante da ``compute_reorder``.
-        output_path: Percorso in cui salvare il file. Verrà sovrascritto se
-            esiste.
+        output_path: Percorso in cui salvare il file (verrà sovrascritto se
+            esiste) oppure oggetto file-like binario in cui scriverlo.
+        orders_df: Righe di ``df`` con ``qty_to_order > 0``, se già filtrate
+            dal chiamante; in caso contrario vengono calcolate qui.
 
     Returns:
-        Il percorso del file generato.
+        Il percorso del file generato, oppure l'oggetto file-like ricevuto.
     """
-    path = Path(output_path)
-    with pd.ExcelWriter(path, engine="openpyxl") as writer:
-        # Ordini da emettere
-        orders = df[df["qty_to_order"] > 0]
-        # Definisce la mappa di traduzione per i nomi delle colonne
-        col_map = {
-            "product_code": "Codice articolo",
-            "product_description": "Descrizione articolo",
-            "vendor_name": "Fornitore",
-            "qty_to_order": "Quantità da ordinare",
-            "qty_shipped_period": "Quantità spedita (periodo)",
-            "qty_ordered_period": "Quantità ordinata (periodo)",
-            "qty_already_ordered_suppliers": "Quantità ordinata ai fornitori",
-            "qty_committed_open_customer_orders": "Quantità ordinata dai clienti",
-            "stock_on_hand_total": "Giacenza totale",
-            "avg_sales_last_6_months": "Media vendite 6 mesi",
-            "pack_size": "Pezzi collo/scatola",
-            "daily_demand": "Domanda giornaliera",
-            "safety_stock_qty": "Scorta di sicurezza",
-            "reorder_point": "Punto di riordino",
-            "target_level": "Livello target",
-            "projected_available": "Disponibilità proiettata",
-            "coverage_days": "Giorni di copertura",
-            "relevance_score": "Punteggio rilevanza",
-        }
-        # Rinominare colonne per ordini suggeriti
-        orders_renamed = orders.rename(columns={k: v for k, v in col_map.items() if k in orders.columns})
-        orders_renamed.to_excel(writer, sheet_name="Ordini_suggeriti", index=False)
-        # Dettaglio completo
-        df_renamed = df.rename(columns={k: v for k, v in col_map.items() if k in df.columns})
-        df_renamed.to_excel(writer, sheet_name="Dettaglio_calcoli", index=False)
-        # Riepilogo per fornitore
-        if not orders.empty:
-            summary = (
-                orders.groupby("vendor_name")
-                .agg(
-                    num_sku=("qty_to_order", "count"),
-                    total_qty=("qty_to_order", "sum"),
-                )
-                .reset_index()
-            )
-        else:
-            summary = pd.DataFrame(
-                {"vendor_name": [], "num_sku": [], "total_qty": []}
-            )
-        # Rinominare anche il riepilogo
-        summary = summary.rename(columns={
-            "vendor_name": "Fornitore",
-            "num_sku": "Numero articoli",
-            "total_qty": "Quantità totale da ordinare",
-        })
-        summary.to_excel(writer, sheet_name="Riepilogo_fornitori", index=False)
-        # Vicini al riordino: projected_available < reorder_point
-        near = df[df["projected_available"] < df["reorder_point"]]
-        near_renamed = near.rename(columns={k: v for k, v in col_map.items() if k in near.columns})
-        near_renamed.to_excel(writer, sheet_name="Vicini_riordino", index=False)
-        # Eccezioni: daily_demand <= 0 o pack_size <= 0
-        exceptions = df[(df["daily_demand"] <= 0) | (df["pack_size"] <= 0)]
-        exceptions_renamed = exceptions.rename(columns={k: v for k, v in col_map.items() if k in exceptions.columns})
-        exceptions_renamed.to_excel(writer, sheet_name="Eccezioni", index=False)
-    return str(path)
+    path = _resolve_output(output_path)
+    with _Workbook(path) as workbook:
+        _write_analysis_sheets(workbook, df, _orders_subset(df, orders_df))
+    return _output_result(path)
 
 
 def generate_orders_by_vendor_xlsx(
     df: pd.DataFrame,
-    output_path: str,
+    output_path: _Output,
     *,
     sort_by: str = "alphabetical",
-) -> str:
+    orders_df: Optional[pd.DataFrame] = None,
+) -> Union[str, IO[bytes]]:
     """Esporta un workbook con un foglio per ciascun fornitore.
 
     Per impostazione predefinita, le righe all'interno di ogni foglio sono
@@ -119,97 +552,113 @@ def generate_orders_by_vendor_xlsx(
 
     Args:
         df: DataFrame risultante da ``compute_reorder``.
-        output_path: Percorso di esportazione del file.
+        output_path: Percorso di esportazione del file oppure oggetto
+            file-like binario in cui scriverlo.
         sort_by: Modalità di ordinamento delle righe all'interno di ogni foglio.
             Può essere "alphabetical" (ordina per product_code) oppure
             "relevance" (ordina per relevance_score decrescente).
+        orders_df: Righe di ``df`` con ``qty_to_order > 0``, se già filtrate
+            dal chiamante; in caso contrario vengono calcolate qui.
 
     Returns:
-        Il percorso del file generato.
+        Il percorso del file generato, oppure l'oggetto file-like ricevuto.
     """
-    path = Path(output_path)
-    with pd.ExcelWriter(path, engine="openpyxl") as writer:
-        orders = df[df["qty_to_order"] > 0]
+    path = _resolve_output(output_path)
+    # Molti fogli di dimensione contenuta: l'XML viene generato direttamente,
+    # evitando il costo per cella delle librerie Excel
+    with _InlineXlsxWorkbook(path) as workbook:
+        orders = _orders_subset(df, orders_df)
         if orders.empty:
             # Se non ci sono ordini, crea un foglio vuoto
-            pd.DataFrame().to_excel(writer, sheet_name="Nessun_ordine", index=False)
+            workbook.add_sheet("Nessun_ordine")
         else:
-            # Determina l'ordine dei fogli (fornitori). Di default alfabetico.
-            vendor_groups = orders.groupby("vendor_name")
-            if sort_by == "relevance" and "relevance_score" in orders.columns:
-                # Calcola un punteggio di rilevanza per ogni fornitore. Usando il massimo tra le righe
-                # per dare priorità ai fornitori con almeno un articolo molto urgente. In alternativa
-                # si potrebbe usare la somma o un'altra misura aggregata.
-                vendor_scores = vendor_groups["relevance_score"].max()
-                # Ordina in senso decrescente (maggiore rilevanza prima)
-                sorted_vendors = vendor_scores.sort_values(ascending=False).index.tolist()
-            else:
-                # Ordina alfabeticamente i fornitori
-                sorted_vendors = sorted(vendor_groups.groups.keys())
-            # Genera un foglio per ciascun fornitore nell'ordine scelto
-            for vendor in sorted_vendors:
-                subset = vendor_groups.get_group(vendor)
-                sheet_name = vendor if isinstance(vendor, str) and vendor else "Senza_nome"
-                # Excel ha un limite di 31 caratteri per il nome del foglio
-                sheet_name = sheet_name[:31]
-                # Ordina il sotto-DataFrame secondo la modalità richiesta
-                sorted_subset = subset.copy()
-                if sort_by == "relevance" and "relevance_score" in sorted_subset.columns:
-                    # Ordina per rilevanza discendente; a parità di punteggio usa il codice articolo per stabilità
-                    sorted_subset = sorted_subset.sort_values(
-                        by=["relevance_score", "product_code"], ascending=[False, True]
-                    )
-                else:
-                    # Ordina alfabeticamente per codice articolo
-                    sorted_subset = sorted_subset.sort_values(by="product_code", ascending=True)
-                # Rinominare le colonne in italiano per l'output.
-                col_map = {
-                    "product_code": "Codice articolo",
-                    "product_description": "Descrizione articolo",
-                    "vendor_name": "Fornitore",
-                    "qty_to_order": "Quantità da ordinare",
-                    "qty_shipped_period": "Quantità spedita (periodo)",
-                    "qty_ordered_period": "Quantità ordinata (periodo)",
-                    "qty_already_ordered_suppliers": "Quantità ordinata ai fornitori",
-                    "qty_committed_open_customer_orders": "Quantità ordinata dai clienti",
-                    "stock_on_hand_total": "Giacenza totale",
-                    "avg_sales_last_6_months": "Media vendite 6 mesi",
-                    "pack_size": "Pezzi collo/scatola",
-                    "daily_demand": "Domanda giornaliera",
-                    "safety_stock_qty": "Scorta di sicurezza",
-                    "reorder_point": "Punto di riordino",
-                    "target_level": "Livello target",
-                    "projected_available": "Disponibilità proiettata",
-                    "coverage_days": "Giorni di copertura",
-                    "relevance_score": "Punteggio rilevanza",
-                }
-                # Applica la rinomina solo alle colonne presenti
-                renamed_subset = sorted_subset.rename(columns={k: v for k, v in col_map.items() if k in sorted_subset.columns})
-                renamed_subset.to_excel(writer, sheet_name=sheet_name, index=False)
-    return str(path)
-
-
-def generate_vendors_template_csv(df: pd.DataFrame, output_path: str) -> str:
+            _write_vendor_sheets(workbook, orders, sort_by)
+    return _output_result(path)
+
+
+def generate_full_report_xlsx(
+    df: pd.DataFrame,
+    output_path: _Output,
+    *,
+    sort_by: str = "alphabetical",
+    orders_df: Optional[pd.DataFrame] = None,
+) -> Union[str, IO[bytes]]:
+    """Esporta un unico workbook con i fogli di analisi e quelli per fornitore.
+
+    Variante consolidata di ``generate_analysis_xlsx`` e
+    ``generate_orders_by_vendor_xlsx``: contenitore ZIP, ``workbook.xml`` e
+    stili vengono prodotti una volta sola e, poiché xlsxwriter lavora qui in
+    modalità standard, i testi ripetuti (fornitori, descrizioni) finiscono
+    nella tabella delle stringhe condivise comune a tutti i fogli. I fogli per
+    fornitore seguono quelli di analisi, con nomi resi univoci anche rispetto a
+    questi ultimi.
+
+    Args:
+        df: DataFrame risultante da ``compute_reorder``.
+        output_path: Percorso in cui salvare il file (verrà sovrascritto se
+            esiste) oppure oggetto file-like binario in cui scriverlo.
+        sort_by: Modalità di ordinamento delle righe nei fogli per fornitore,
+            come in ``generate_orders_by_vendor_xlsx``.
+        orders_df: Righe di ``df`` con ``qty_to_order > 0``, se già filtrate
+            dal chiamante; in caso contrario vengono calcolate qui.
+
+    Returns:
+        Il percorso del file generato, oppure l'oggetto file-like ricevuto.
+    """
+    path = _resolve_output(output_path)
+    orders = _orders_subset(df, orders_df)
+    with _Workbook(path, constant_memory=False) as workbook:
+        _write_analysis_sheets(workbook, df, orders)
+        if not orders.empty:
+            _write_vendor_sheets(
+                workbook,
+                orders,
+                sort_by,
+                reserved=(
+                    "Ordini_suggeriti",
+                    "Dettaglio_calcoli",
+                    "Riepilogo_fornitori",
+                    "Vicini_riordino",
+                    "Eccezioni",
+                ),
+            )
+    return _output_result(path)
+
+
+def generate_vendors_template_csv(
+    df: pd.DataFrame, output_path: _Output
+) -> Union[str, IO[bytes]]:
     """Crea un template CSV con l’elenco dei fornitori e alcune colonne da compilare.
 
     Args:
         df: DataFrame risultante da ``compute_reorder`` (serve solo per ottenere
             l’elenco dei fornitori).
-        output_path: Percorso del file CSV da creare.
+        output_path: Percorso del file CSV da creare oppure oggetto file-like
+            binario in cui scriverlo.
 
     Returns:
-        Il percorso del file generato.
+        Il percorso del file generato, oppure l'oggetto file-like ricevuto.
     """
-    path = Path(output_path)
-    unique_vendors = sorted(set(df["vendor_name"].dropna().astype(str)))
-    template = pd.DataFrame(
-        {
-            "vendor_name": unique_vendors,
-            "vendor_code": ["" for _ in unique_vendors],
-            "moq": [0 for _ in unique_vendors],
-            "default_lead_time": [10 for _ in unique_vendors],
-            "currency": ["EUR" for _ in unique_vendors],
-        }
+    path = _resolve_output(output_path)
+    unique_vendors = (
+        df["vendor_name"].dropna().astype("string").drop_duplicates().sort_values().tolist()
     )
-    template.to_csv(path, index=False)
-    return str(path)
\ No newline at end of file
+    # Poche righe con valori costanti: il modulo ``csv`` le scrive direttamente,
+    # senza costruire un DataFrame apposito
+    if isinstance(path, Path):
+        fh = open(path, "w", newline="", encoding="utf-8")
+    else:
+        fh = io.TextIOWrapper(path, encoding="utf-8", newline="")
+    try:
+        writer = csv.writer(fh, lineterminator="\n")
+        writer.writerow(["vendor_name", "vendor_code", "moq", "default_lead_time", "currency"])
+        writer.writerows([vendor, "", 0, 10, "EUR"] for vendor in unique_vendors)
+    finally:
+        if isinstance(path, Path):
+            fh.close()
+        else:
+            # Svuota il buffer di testo e restituisce l'oggetto binario al chiamante
+            # senza chiuderlo
+            fh.flush()
+            fh.detach()
+    return _output_result(path)
@@ -29,13 +29,118 @@ Principi del calcolo:
 
 from __future__ import annotations
 
-import math
 from datetime import date
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+try:
+    import numexpr
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    # Senza numexpr le stesse formule vengono valutate con le ufunc di NumPy
+    numexpr = None
+
+try:
+    import numbagg
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    # Senza numbagg le riduzioni per gruppo usano ordinamento e ``reduceat``
+    numbagg = None
+
+# Sotto questa soglia di righe l'ordinamento costa meno della compilazione JIT
+# delle funzioni numbagg al primo utilizzo
+_NUMBAGG_MIN_ROWS = 1_000_000
+
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    # Senza numba si usa il percorso vettoriale NumPy/numexpr di ``compute_reorder``
+    njit = None
+
+# Colonne calcolate dopo l'aggregazione, nell'ordine in cui vengono aggiunte
+_DERIVED_COLUMNS = (
+    "daily_demand",
+    "safety_stock_qty",
+    "reorder_point",
+    "target_level",
+    "projected_available",
+    "qty_to_order",
+    "coverage_days",
+    "relevance_score",
+)
+
+if njit is not None:
+
+    # ``fastmath`` non viene abilitato: riassociare le operazioni cambierebbe gli
+    # arrotondamenti e, al bordo di un collo, la quantità da ordinare rispetto al
+    # percorso NumPy usato quando numba non è installato.
+    @njit(parallel=True, cache=True)
+    def _reorder_kernel(
+        shipped, avg6, ordered, committed, stock, pack, period_days, lead_time, target_days, safety
+    ):  # pragma: no cover - compilato da numba
+        """Calcola in un solo passaggio per riga tutte le colonne di ``_DERIVED_COLUMNS``.
+
+        I parametri scalari arrivano già nel tipo degli array (float64), così le
+        operazioni avvengono con la stessa precisione del percorso NumPy;
+        ``target_days`` è la somma ``lead_time + coverage``, calcolata una sola
+        volta dal chiamante.
+        """
+        n = shipped.shape[0]
+        dtype = shipped.dtype
+        daily_demand = np.empty(n, dtype)
+        safety_stock = np.empty(n, dtype)
+        reorder_point = np.empty(n, dtype)
+        target = np.empty(n, dtype)
+        projected = np.empty(n, dtype)
+        qty = np.empty(n, np.int64)
+        coverage_days = np.empty(n, dtype)
+        relevance = np.empty(n, dtype)
+        month = dtype.type(30.0)
+        zero = dtype.type(0.0)
+        one = dtype.type(1.0)
+        for i in prange(n):
+            dd = max(shipped[i] / period_days, avg6[i] / month)
+            ss = dd * safety
+            tgt = dd * target_days + ss
+            pa = stock[i] - committed[i] + ordered[i]
+            # Fabbisogno, arrotondato al collo quando valido; senza fabbisogno
+            # (disponibilità già al target) l'arrotondamento viene saltato
+            need = tgt - pa
+            p = pack[i]
+            if need <= 0:
+                qty[i] = 0
+            elif np.isfinite(p) and p > 0:
+                qty[i] = np.int64(np.ceil(need / p) * p)
+            else:
+                qty[i] = np.int64(np.ceil(need))
+            # Copertura residua (NaN senza domanda) e rilevanza, con le coperture
+            # mancanti o negative trattate come 0
+            if dd > zero:
+                cov = pa / dd
+                coverage_days[i] = cov
+                relevance[i] = dd / (max(cov, zero) + one)
+            else:
+                coverage_days[i] = np.nan
+                relevance[i] = dd / one
+            daily_demand[i] = dd
+            safety_stock[i] = ss
+            reorder_point[i] = dd * lead_time + ss
+            target[i] = tgt
+            projected[i] = pa
+        return (
+            daily_demand,
+            safety_stock,
+            reorder_point,
+            target,
+            projected,
+            qty,
+            coverage_days,
+            relevance,
+        )
+
+else:
+    _reorder_kernel = None
+
 
 def _safe_numeric(series: pd.Series) -> pd.Series:
     """Converte una serie in numerico sostituendo i NaN con 0.
@@ -46,7 +151,224 @@ def _safe_numeric(series: pd.Series) -> pd.Series:
     Returns:
         Una serie con valori numerici dove i NaN sono sostituiti con 0.
     """
-    return pd.to_numeric(series.fillna(0), errors="coerce").fillna(0)
+    # Le colonne già numeriche (il caso tipico con calamine/openpyxl) non passano
+    # da ``to_numeric``: basta sostituire i NaN. Per le altre ``errors="coerce"``
+    # trasforma in NaN sia i valori mancanti sia quelli non convertibili, e lo
+    # stesso ``fillna`` finale copre entrambi i casi.
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors="coerce")
+    return series.fillna(0)
+
+
+def _policy_levels(
+    daily_demand: np.ndarray,
+    stock: np.ndarray,
+    committed: np.ndarray,
+    ordered: np.ndarray,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+) -> Dict[str, np.ndarray]:
+    """Calcola scorta di sicurezza, ROP, target, disponibilità e fabbisogno.
+
+    Con numexpr ogni formula è valutata in un solo passaggio a blocchi (e su
+    più thread) direttamente sugli array di ingresso: il fabbisogno ``raw_need``
+    non richiede di materializzare prima target e disponibilità. In assenza di
+    numexpr si usano le equivalenti operazioni NumPy.
+
+    Args:
+        daily_demand: Domanda giornaliera per articolo/fornitore.
+        stock: Giacenza totale.
+        committed: Quantità impegnata su ordini clienti.
+        ordered: Quantità già ordinata ai fornitori.
+        lead_time: Giorni di approvvigionamento.
+        coverage: Giorni di copertura desiderati oltre il lead time.
+        safety: Giorni di scorta di sicurezza.
+
+    Returns:
+        Dizionario con gli array ``safety_stock_qty``, ``reorder_point``,
+        ``target_level``, ``projected_available``, ``raw_need`` (mai negativo) e
+        ``coverage_days`` (NaN dove la domanda è nulla).
+    """
+    # I parametri diventano scalari dello stesso tipo della domanda, così i
+    # risultati non vengono promossi a una precisione maggiore
+    dtype = daily_demand.dtype.type
+    if numexpr is not None:
+        env = {
+            "dd": daily_demand,
+            "soh": stock,
+            "cc": committed,
+            "ao": ordered,
+            "lt": dtype(lead_time),
+            "cov": dtype(coverage),
+            "saf": dtype(safety),
+            "zero": dtype(0),
+            "nan": dtype(np.nan),
+        }
+        need = "dd * (lt + cov) + dd * saf - (soh - cc + ao)"
+        return {
+            "safety_stock_qty": numexpr.evaluate("dd * saf", local_dict=env),
+            "reorder_point": numexpr.evaluate("dd * lt + dd * saf", local_dict=env),
+            "target_level": numexpr.evaluate("dd * (lt + cov) + dd * saf", local_dict=env),
+            "projected_available": numexpr.evaluate("soh - cc + ao", local_dict=env),
+            "raw_need": numexpr.evaluate(f"where({need} > zero, {need}, zero)", local_dict=env),
+            "coverage_days": numexpr.evaluate(
+                "where(dd > zero, (soh - cc + ao) / dd, nan)", local_dict=env
+            ),
+        }
+    safety_stock = daily_demand * dtype(safety)
+    target = daily_demand * dtype(lead_time + coverage) + safety_stock
+    projected = stock - committed + ordered
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage_days = np.where(daily_demand > 0, projected / daily_demand, dtype(np.nan))
+    return {
+        "safety_stock_qty": safety_stock,
+        "reorder_point": daily_demand * dtype(lead_time) + safety_stock,
+        "target_level": target,
+        "projected_available": projected,
+        "raw_need": np.maximum(target - projected, 0),
+        "coverage_days": coverage_days,
+    }
+
+
+# Aggregatori applicati a ciascuna colonna numerica nel raggruppamento per
+# articolo/fornitore (``qty_ordered_period`` non serve al calcolo e viene scartata)
+_AGGREGATIONS = {
+    "qty_shipped_period": np.add,
+    # usa il massimo per evitare di sommare lo stesso ordine ai fornitori più volte
+    "qty_already_ordered_suppliers": np.maximum,
+    # anche la quantità ordinata dai clienti è unica per articolo: usa il massimo per non duplicarla
+    "qty_committed_open_customer_orders": np.maximum,
+    "stock_on_hand_total": np.maximum,
+    "avg_sales_last_6_months": np.maximum,
+    "pack_size": np.maximum,
+}
+
+
+def _reduce_sorted(
+    df: pd.DataFrame, codes: np.ndarray, n_groups: int, present: np.ndarray
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Riduzioni di ``_AGGREGATIONS`` con un ordinamento stabile e ``ufunc.reduceat``.
+
+    Args:
+        df: Frame di lavoro, senza righe con chiave mancante.
+        codes: Codice di gruppo di ogni riga, denso e in ordine di prima apparizione.
+        n_groups: Numero di gruppi.
+        present: Righe con ``product_description`` non nulla.
+
+    Returns:
+        Le colonne aggregate e, per ogni gruppo, la riga da cui leggere la
+        descrizione (-1 se nessuna riga del gruppo ne ha una).
+    """
+    # Dopo l'ordinamento stabile dei codici ogni gruppo occupa un blocco contiguo
+    # che inizia in ``starts`` (i codici sono non negativi, quindi
+    # ``prepend=-1`` apre sempre il primo blocco). Con pochi gruppi i codici
+    # stanno in 16 bit, e per questi NumPy usa un radix sort lineare.
+    sort_codes = codes.astype(np.uint16) if n_groups <= 1 << 16 else codes
+    order = np.argsort(sort_codes, kind="stable")
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+
+    reduced = {}
+    for col, ufunc in _AGGREGATIONS.items():
+        values = df[col].to_numpy()
+        if ufunc is np.add:
+            # Le somme vengono accumulate in doppia precisione e riportate al tipo
+            # della colonna, come fa ``groupby().sum()``
+            reduced[col] = ufunc.reduceat(values[order], starts, dtype=np.float64).astype(values.dtype)
+        else:
+            reduced[col] = ufunc.reduceat(values[order], starts)
+    if present.all():
+        # Caso tipico: la prima riga di ogni blocco ordinato è la prima del gruppo
+        positions = order[starts]
+    else:
+        # ``first`` di pandas ignora i valori mancanti: si prende la prima
+        # descrizione non nulla di ciascun gruppo (nell'ordine stabile, il minimo
+        # indice ordinato con descrizione presente; ``len(order)`` fa da
+        # sentinella per i gruppi senza descrizione)
+        candidates = np.where(present[order], np.arange(len(order)), len(order))
+        first = np.minimum.reduceat(candidates, starts)
+        positions = np.where(first < len(order), order[np.minimum(first, len(order) - 1)], -1)
+    return reduced, positions
+
+
+def _reduce_numbagg(
+    df: pd.DataFrame, codes: np.ndarray, n_groups: int, present: np.ndarray
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Come ``_reduce_sorted``, ma con le riduzioni per gruppo di numbagg.
+
+    numbagg accumula direttamente per etichetta senza ordinare le righe, ma
+    compila ogni funzione al primo utilizzo nel processo (alcuni secondi): per
+    questo viene usato solo sopra ``_NUMBAGG_MIN_ROWS`` righe, dove il costo
+    dell'ordinamento diventa rilevante e la compilazione si ammortizza.
+    """
+    reduced = {}
+    for col, ufunc in _AGGREGATIONS.items():
+        values = df[col].to_numpy()
+        if ufunc is np.add:
+            # Somme accumulate in doppia precisione, come nel percorso ordinato
+            sums = numbagg.group_nansum(values.astype(np.float64), codes, num_labels=n_groups)
+            reduced[col] = sums.astype(values.dtype)
+        else:
+            reduced[col] = numbagg.group_nanmax(values, codes, num_labels=n_groups)
+    if present.all():
+        # I codici sono assegnati in ordine di prima apparizione: una riga apre un
+        # nuovo gruppo quando il suo codice supera tutti quelli precedenti
+        positions = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1))
+    else:
+        # Minimo indice di riga con descrizione presente (NaN se non ce n'è)
+        rows = np.where(present, np.arange(len(codes), dtype=np.float64), np.nan)
+        first = numbagg.group_nanmin(rows, codes, num_labels=n_groups)
+        positions = np.nan_to_num(first, nan=-1).astype(np.intp)
+    return reduced, positions
+
+
+def _aggregate_by_key(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggrega ``df`` per articolo e fornitore con un solo ordinamento delle righe.
+
+    Equivale a ``groupby(["product_code", "vendor_name"], sort=False).agg(...)``
+    con gli aggregatori di ``_AGGREGATIONS`` e il primo ``product_description``
+    non nullo, ma le chiavi vengono fattorizzate una volta sola: dopo un ordinamento stabile dei
+    codici di gruppo ogni colonna richiede una sola ``ufunc.reduceat`` lineare,
+    invece di un passaggio Cython separato con il proprio contesto di gruppo.
+    Come in ``groupby``, le righe con una chiave mancante vengono scartate e i
+    gruppi restano nell'ordine di prima apparizione.
+
+    Args:
+        df: Frame di lavoro con chiavi, descrizione e colonne numeriche.
+
+    Returns:
+        Un DataFrame con una riga per gruppo, le chiavi, le colonne aggregate e
+        ``product_description``.
+    """
+    # Ogni chiave viene fattorizzata da sola (i mancanti diventano -1) e i due
+    # codici vengono combinati in un unico int64 (articolo nei 32 bit alti,
+    # fornitore in quelli bassi): una seconda fattorizzazione, su interi,
+    # assegna a ogni gruppo un codice denso in ordine di prima apparizione senza
+    # costruire tuple per riga.
+    product_ids, products = pd.factorize(df["product_code"])
+    vendor_ids, vendors = pd.factorize(df["vendor_name"])
+    valid = (product_ids >= 0) & (vendor_ids >= 0)
+    if not valid.all():
+        df = df.iloc[valid]
+        product_ids, vendor_ids = product_ids[valid], vendor_ids[valid]
+    codes, group_keys = pd.factorize((product_ids.astype(np.int64) << 32) | vendor_ids)
+    n_groups = len(group_keys)
+    # La descrizione resta fuori dalle riduzioni numeriche: basta scegliere una
+    # riga per gruppo e prenderne il valore con un solo ``take``
+    descriptions = df["product_description"]
+    present = descriptions.notna().to_numpy()
+    if numbagg is not None and len(codes) >= _NUMBAGG_MIN_ROWS:
+        reduced, positions = _reduce_numbagg(df, codes, n_groups, present)
+    else:
+        reduced, positions = _reduce_sorted(df, codes, n_groups, present)
+
+    columns = {
+        "product_code": products.take(group_keys >> 32),
+        "vendor_name": vendors.take(group_keys & 0xFFFFFFFF),
+        **reduced,
+    }
+    columns["product_description"] = descriptions.array.take(positions, allow_fill=True)
+    return pd.DataFrame(columns, index=pd.RangeIndex(n_groups))
 
 
 def compute_reorder(
@@ -76,25 +398,7 @@ def compute_reorder(
         aggiuntive (domanda giornaliera, scorta di sicurezza, punti di riordino,
         quantità da ordinare, etc.).
     """
-    df = df.copy()
-    # Garantisce la presenza delle colonne richieste, inizializzandole con 0 se assenti
-    for col in [
-        "qty_shipped_period",
-        "qty_ordered_period",
-        "qty_already_ordered_suppliers",
-        "qty_committed_open_customer_orders",
-        "stock_on_hand_total",
-        "avg_sales_last_6_months",
-        "pack_size",
-    ]:
-        if col not in df.columns:
-            df[col] = 0
-    if "vendor_name" not in df.columns:
-        df["vendor_name"] = ""
-    if "product_description" not in df.columns:
-        df["product_description"] = ""
-
-    # Assicura che le colonne numeriche siano effettivamente numeriche
+    # Colonne numeriche utilizzate dal calcolo
     num_cols = [
         "qty_shipped_period",
         "qty_ordered_period",
@@ -104,7 +408,25 @@ def compute_reorder(
         "avg_sales_last_6_months",
         "pack_size",
     ]
-    df[num_cols] = df[num_cols].apply(_safe_numeric)
+    # Costruisce il frame di lavoro solo con le colonne necessarie, senza copiare
+    # né modificare quello del chiamante: le esportazioni SAP contengono molte
+    # altre colonne che verrebbero duplicate inutilmente prima dell'aggregazione.
+    # Le colonne mancanti vengono inizializzate con 0 (numeriche) o "" (testo).
+    #
+    # Tutte le colonne numeriche, collo compreso, restano in float64: in precisione
+    # singola la differenza tra target e disponibilità cade spesso appena sopra il
+    # valore esatto e ``ceil`` aggiunge un pezzo (o un collo) in più, mentre un
+    # collo intero troncherebbe le confezioni frazionarie (2,5 → 2, 0,5 → 0).
+    # La conversione avviene colonna per colonna, senza passare da ``DataFrame.apply``.
+    columns = {"product_code": df["product_code"]}
+    for col in ("vendor_name", "product_description"):
+        columns[col] = df[col] if col in df.columns else ""
+    for col in num_cols:
+        if col in df.columns:
+            columns[col] = _safe_numeric(df[col]).astype(np.float64)
+        else:
+            columns[col] = np.zeros(len(df), dtype=np.float64)
+    df = pd.DataFrame(columns, index=df.index)
 
     # Determina la durata in giorni del periodo
     if start_date and end_date:
@@ -113,8 +435,6 @@ def compute_reorder(
         # Se non specificato, assume un periodo di 30 giorni
         period_days = 30
 
-    # Raggruppa per articolo e fornitore
-    group_cols = ["product_code", "vendor_name"]
     # Aggregazione per ciascun codice articolo e fornitore.
     # Per le colonne ``qty_already_ordered_suppliers`` e ``qty_committed_open_customer_orders``
     # si usa un aggregatore specifico: la quantità di ordini ai fornitori non deve essere
@@ -122,67 +442,91 @@ def compute_reorder(
     # fornitore (il dato proviene dalla tabella ordini fornitore). Invece la quantità
     # ordinata dai clienti va sommata in quanto rappresenta il totale degli ordini
     # aperti dei clienti per quell'articolo.
-    agg = df.groupby(group_cols).agg(
-        qty_shipped_period=("qty_shipped_period", "sum"),
-        # usa il massimo per evitare di sommare lo stesso ordine ai fornitori più volte
-        qty_already_ordered_suppliers=("qty_already_ordered_suppliers", "max"),
-        # anche la quantità ordinata dai clienti è unica per articolo: usa il massimo per non duplicarla
-        qty_committed_open_customer_orders=("qty_committed_open_customer_orders", "max"),
-        stock_on_hand_total=("stock_on_hand_total", "max"),
-        avg_sales_last_6_months=("avg_sales_last_6_months", "max"),
-        pack_size=("pack_size", "max"),
-        product_description=("product_description", "first"),
-    ).reset_index()
-
-    # Domanda giornaliera
-    shipments_daily = agg["qty_shipped_period"] / period_days
-    avg_month = agg["avg_sales_last_6_months"] / 30.0
-    agg["daily_demand"] = np.where(shipments_daily > avg_month, shipments_daily, avg_month)
-
-    # Scorta di sicurezza, ROP e target
-    agg["safety_stock_qty"] = agg["daily_demand"] * safety
-    agg["reorder_point"] = agg["daily_demand"] * lead_time + agg["safety_stock_qty"]
-    agg["target_level"] = agg["daily_demand"] * (lead_time + coverage) + agg["safety_stock_qty"]
-
-    # Disponibilità proiettata
-    agg["projected_available"] = (
-        agg["stock_on_hand_total"]
-        - agg["qty_committed_open_customer_orders"]
-        + agg["qty_already_ordered_suppliers"]
-    )
+    agg = _aggregate_by_key(df)
 
-    # Fabbisogno grezzo
-    raw_need = agg["target_level"] - agg["projected_available"]
-    raw_need[raw_need < 0] = 0
+    # Nessun gruppo (file vuoto o senza chiavi valide): le colonne derivate
+    # vengono solo create vuote, senza avviare kernel o calcoli vettoriali
+    if agg.empty:
+        dtype = agg["qty_shipped_period"].dtype
+        for col in _DERIVED_COLUMNS:
+            agg[col] = np.empty(0, dtype=np.int64 if col == "qty_to_order" else dtype)
+        return agg
 
-    # Arrotondamento al multiplo del collo
-    def _apply_pack_size(qty: float, pack: float) -> int:
-        if pack is None or pack == 0 or math.isnan(pack):
-            return int(math.ceil(qty))
-        return int(math.ceil(qty / pack) * pack)
+    if _reorder_kernel is not None:
+        # Con numba tutte le colonne derivate vengono calcolate da un unico kernel
+        # compilato e parallelo, che legge ogni colonna aggregata una sola volta
+        dtype = agg["qty_shipped_period"].dtype.type
+        outputs = _reorder_kernel(
+            agg["qty_shipped_period"].to_numpy(),
+            agg["avg_sales_last_6_months"].to_numpy(),
+            agg["qty_already_ordered_suppliers"].to_numpy(),
+            agg["qty_committed_open_customer_orders"].to_numpy(),
+            agg["stock_on_hand_total"].to_numpy(),
+            agg["pack_size"].to_numpy(),
+            dtype(period_days),
+            dtype(lead_time),
+            dtype(lead_time + coverage),
+            dtype(safety),
+        )
+        for col, values in zip(_DERIVED_COLUMNS, outputs):
+            agg[col] = values
+        return agg
 
-    agg["qty_to_order"] = [
-        _apply_pack_size(qty, pack) for qty, pack in zip(raw_need, agg["pack_size"])
-    ]
+    # Domanda giornaliera: massimo tra quota giornaliera delle spedizioni e media a 6 mesi
+    agg["daily_demand"] = np.maximum(
+        agg["qty_shipped_period"].to_numpy() / period_days,
+        agg["avg_sales_last_6_months"].to_numpy() / 30.0,
+    )
 
-    # Calcola la copertura residua in giorni sulla base della disponibilità proiettata
-    agg["coverage_days"] = np.where(
-        agg["daily_demand"] > 0,
-        agg["projected_available"] / agg["daily_demand"],
-        np.nan,
+    # Scorta di sicurezza, ROP, target, disponibilità proiettata e fabbisogno
+    # grezzo (mai negativo), calcolati in un'unica valutazione fusa
+    levels = _policy_levels(
+        agg["daily_demand"].to_numpy(),
+        agg["stock_on_hand_total"].to_numpy(),
+        agg["qty_committed_open_customer_orders"].to_numpy(),
+        agg["qty_already_ordered_suppliers"].to_numpy(),
+        lead_time,
+        coverage,
+        safety,
     )
+    for col in ("safety_stock_qty", "reorder_point", "target_level", "projected_available"):
+        agg[col] = levels[col]
+    raw_need = levels["raw_need"]
+
+    # Arrotondamento al multiplo del collo. Gli articoli già coperti fino al
+    # target (fabbisogno nullo, spesso la maggioranza del catalogo) restano a 0
+    # senza passare dall'arrotondamento, che lavora solo sulle righe da ordinare.
+    # Le righe senza un collo valido (nullo, zero o negativo) vengono solo
+    # arrotondate all'intero superiore.
+    qty_to_order = np.zeros(len(raw_need), dtype=np.int64)
+    needs = raw_need > 0
+    raw = raw_need[needs]
+    pack = agg["pack_size"].to_numpy()[needs]
+    # Le righe vengono separate una volta per presenza del collo: ciascuna parte
+    # passa da un'unica espressione vettoriale, senza selezioni per elemento
+    has_pack = np.isfinite(pack) & (pack > 0)
+    rounded = np.empty(len(raw), dtype=np.int64)
+    rounded[has_pack] = np.ceil(raw[has_pack] / pack[has_pack]) * pack[has_pack]
+    rounded[~has_pack] = np.ceil(raw[~has_pack])
+    qty_to_order[needs] = rounded
+    agg["qty_to_order"] = qty_to_order
+
+    # Copertura residua in giorni sulla base della disponibilità proiettata
+    agg["coverage_days"] = levels["coverage_days"]
 
     # Valuta la "rilevanza" del riordino combinando urgenza (copertura) e domanda.
     # Per dare priorità agli articoli con scorte basse e domanda elevata, calcoliamo
     # un punteggio che cresce al diminuire della copertura e aumenta con la domanda.
     # Coperture nulle o negative vengono trattate come 0 (urgenza massima).
-    safe_cov = agg["coverage_days"].fillna(0).copy()
-    # Coperture negative non hanno significato pratico; forziamo il minimo a 0
-    safe_cov[safe_cov < 0] = 0
+    # ``np.fmax`` ignora i NaN: coperture mancanti e negative diventano 0 in un
+    # solo passaggio, senza ``fillna`` né maschera booleana. Il divisore è un
+    # nuovo array, aggiornato poi sul posto senza ulteriori allocazioni.
+    divisor = np.fmax(levels["coverage_days"], 0.0)
+    divisor += 1
     # Il punteggio di rilevanza è la domanda giornaliera divisa per (copertura + 1)
     # In questo modo, una copertura più bassa e una domanda più alta portano a un
     # valore maggiore. Per copertura=0 il divisore è 1, quindi il punteggio = domanda.
-    agg["relevance_score"] = agg["daily_demand"] / (safe_cov + 1)
+    agg["relevance_score"] = np.divide(agg["daily_demand"].to_numpy(), divisor, out=divisor)
 
     # Scarta colonne non più necessarie per la restituzione finale? Manteniamo tutte per audit
     return agg
\ No newline at end of file
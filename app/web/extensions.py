@@ -2,7 +2,8 @@
 # This file registers additional tabs (Cross-sell and Import Ordine) safely.
 import streamlit as st
 
-# Attempt to import optional dependencies
+# Attempt to import optional dependencies (checked once per process, not on every rerun)
+@st.cache_resource(show_spinner=False)
 def _lazy_imports():
     missing = []
     try:
@@ -52,7 +53,7 @@ def _register_extended_tabs():
 # Inject tabs if not already injected
 def _auto_inject_tabs():
     try:
-        if st.session_state.get("_extended_tabs_injected") is None:
+        if "_extended_tabs_injected" not in st.session_state:
             _register_extended_tabs()
             st.session_state["_extended_tabs_injected"] = True
     except Exception:
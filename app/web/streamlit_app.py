@@ -10,9 +10,10 @@ fornitori.
 
 from __future__ import annotations
 
+import hashlib
 import io
-import os
-import tempfile
+from typing import IO
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 
 # --- Add parent folder to sys.path ----------------------------------------------------
@@ -55,6 +56,194 @@ from app import parsing, io_excel, rules, reporting
 import pandas as pd
 
 
+# Streamlit riesegue ``main()`` a ogni interazione con un widget: le funzioni
+# seguenti memorizzano in cache lettura, calcolo e report.  Le chiavi sono
+# l'impronta del contenuto del file caricato più i parametri, quindi un cambio
+# di ordinamento non rilegge l'Excel e un cambio di parametri non ne ripete il
+# parsing.  Il file caricato passa come ``_upload``: i parametri con il trattino
+# basso sono esclusi dalla chiave, così Streamlit non ne riesamina il contenuto
+# a ogni rerun, e i byte vengono letti solo quando la cache non ha il risultato.
+#
+# Le cache di ``st.cache_data`` sono condivise da tutte le sessioni del processo:
+# senza limiti ogni combinazione di file e parametri resterebbe in memoria. Il
+# DataFrame grezzo serve solo per il file corrente, i risultati e i report per
+# le ultime combinazioni provate; dopo un'ora le voci scadono comunque.
+_CACHE_TTL_SECONDS = 3600
+_RAW_CACHE_ENTRIES = 2
+_RESULT_CACHE_ENTRIES = 8
+_REPORT_CACHE_ENTRIES = 4
+
+
+def _content_digest(uploaded_file) -> str:
+    """Restituisce l'impronta BLAKE2b del file caricato, calcolata una volta sola.
+
+    L'impronta resta in ``st.session_state`` associata al ``file_id`` del
+    caricamento: i rerun successivi con lo stesso file la riutilizzano senza
+    rileggere i byte. Le versioni di Streamlit che non espongono ``file_id``
+    ricalcolano l'impronta a ogni rerun.
+
+    Args:
+        uploaded_file: File restituito da ``st.file_uploader``.
+
+    Returns:
+        Impronta esadecimale del contenuto del file.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    cached = st.session_state.get("_upload_digest")
+    if file_id is None or cached is None or cached[0] != file_id:
+        digest = hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+        if file_id is None:
+            return digest
+        cached = (file_id, digest)
+        st.session_state["_upload_digest"] = cached
+    return cached[1]
+
+
+@st.cache_data(show_spinner=False, max_entries=_RAW_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _load_sales(digest: str, _upload: IO[bytes]) -> pd.DataFrame:
+    """Legge e normalizza il file Excel caricato, dati la sua impronta e il file."""
+    # Nessun ``engine`` esplicito: ``io_excel`` usa calamine quando è installato
+    # (``python-calamine`` è tra i requisiti) e altrimenti openpyxl. Il file
+    # viene letto sul posto dall'inizio, senza copiarne i byte.
+    _upload.seek(0)
+    return io_excel.read_sales_excel(_upload)
+
+
+@st.cache_data(show_spinner=False, max_entries=_RESULT_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _compute_reorder_cached(
+    digest: str,
+    _upload: IO[bytes],
+    start_date: date,
+    end_date: date,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+) -> pd.DataFrame:
+    """Calcola il riordino per il file indicato riutilizzando la lettura in cache."""
+    return rules.compute_reorder(
+        _load_sales(digest, _upload),
+        start_date=start_date,
+        end_date=end_date,
+        lead_time=lead_time,
+        coverage=coverage,
+        safety=safety,
+    )
+
+
+# I report dipendono dal file e dai parametri tramite ``reorder_df``, che arriva
+# come argomento escluso dalla chiave (``_reorder_df``): impronta e parametri lo
+# identificano già. Solo il workbook per fornitore dipende dall'ordinamento, così
+# un cambio di ordinamento rigenera soltanto quello.
+@st.cache_data(show_spinner=False, max_entries=_REPORT_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _build_analysis_report(
+    digest: str,
+    start_date: date,
+    end_date: date,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+    _reorder_df: pd.DataFrame,
+    _orders_df: pd.DataFrame,
+) -> bytes:
+    """Genera il workbook di analisi in byte."""
+    buf = io.BytesIO()
+    reporting.generate_analysis_xlsx(_reorder_df, buf, orders_df=_orders_df)
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=_REPORT_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _build_vendors_template(
+    digest: str,
+    start_date: date,
+    end_date: date,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+    _reorder_df: pd.DataFrame,
+) -> bytes:
+    """Genera il template CSV dell'anagrafica fornitori in byte."""
+    buf = io.BytesIO()
+    reporting.generate_vendors_template_csv(_reorder_df, buf)
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=_REPORT_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _build_vendor_report(
+    digest: str,
+    start_date: date,
+    end_date: date,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+    sort_by: str,
+    _reorder_df: pd.DataFrame,
+    _orders_df: pd.DataFrame,
+) -> bytes:
+    """Genera il workbook degli ordini per fornitore, nell'ordinamento scelto, in byte."""
+    buf = io.BytesIO()
+    reporting.generate_orders_by_vendor_xlsx(
+        _reorder_df, buf, sort_by=sort_by, orders_df=_orders_df
+    )
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=_REPORT_CACHE_ENTRIES, ttl=_CACHE_TTL_SECONDS)
+def _build_full_report(
+    digest: str,
+    start_date: date,
+    end_date: date,
+    lead_time: int,
+    coverage: int,
+    safety: int,
+    sort_by: str,
+    _reorder_df: pd.DataFrame,
+    _orders_df: pd.DataFrame,
+) -> bytes:
+    """Genera il workbook unico (analisi e fogli per fornitore) in byte."""
+    buf = io.BytesIO()
+    reporting.generate_full_report_xlsx(_reorder_df, buf, sort_by=sort_by, orders_df=_orders_df)
+    return buf.getvalue()
+
+
+def _build_reports(
+    digest: str,
+    params: tuple,
+    sort_by: str,
+    reorder_df: pd.DataFrame,
+    orders_df: pd.DataFrame,
+) -> tuple[bytes, bytes, bytes]:
+    """Restituisce i tre report scaricabili, dalla cache o generandoli.
+
+    Args:
+        digest: Impronta del file caricato.
+        params: Data di inizio e fine, lead time, copertura e scorta di sicurezza.
+        sort_by: Ordinamento delle righe nel workbook per fornitore.
+        reorder_df: Risultato di ``compute_reorder`` per file e parametri.
+        orders_df: Righe di ``reorder_df`` con ``qty_to_order > 0``.
+
+    Returns:
+        Tupla con workbook di analisi, ordini per fornitore e template CSV.
+    """
+    # I report vengono generati direttamente in memoria, senza passare dal disco.
+    # Sono indipendenti e leggono soltanto i DataFrame, quindi possono girare in
+    # thread separati; quelli già in cache ritornano subito. La serializzazione
+    # di xlsxwriter e di ``_InlineXlsxWorkbook`` è Python puro e resta legata al
+    # GIL: si sovrappone alle altre solo la compressione zlib, che lo rilascia,
+    # per cui il guadagno rispetto all'esecuzione in sequenza è parziale.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(_build_analysis_report, digest, *params, reorder_df, orders_df),
+            # Passa la modalità di ordinamento alla funzione di esportazione degli ordini
+            executor.submit(
+                _build_vendor_report, digest, *params, sort_by, reorder_df, orders_df
+            ),
+            executor.submit(_build_vendors_template, digest, *params, reorder_df),
+        ]
+        # ``result`` propaga nel thread principale eventuali eccezioni dei report
+        analysis_bytes, vendor_bytes, vendors_csv_bytes = (f.result() for f in futures)
+    return analysis_bytes, vendor_bytes, vendors_csv_bytes
+
+
 def main() -> None:
     st.set_page_config(page_title="Riordino SAP B1", layout="wide")
     st.title("Calcolo automatico dei riordini da SAP Business One")
@@ -129,24 +318,23 @@ def main() -> None:
         start_date = manual_start
         end_date = manual_end
 
-        # Lettura del file Excel
+        # Lettura del file Excel e calcolo del riordino (in cache sull'impronta del
+        # contenuto). Gli errori di lettura emergono dalla chiamata al calcolo, che
+        # legge il file alla prima esecuzione: ai rerun successivi si ottiene solo
+        # il risultato in cache, senza deserializzare anche il DataFrame grezzo.
+        digest = _content_digest(uploaded_file)
+        params = (start_date, end_date, int(lead_time), int(coverage), int(safety))
         try:
-            df_raw = io_excel.read_sales_excel(uploaded_file)
+            reorder_df = _compute_reorder_cached(digest, uploaded_file, *params)
         except Exception as exc:
             st.error(f"Errore nella lettura del file: {exc}")
             return
 
-        # Calcolo del riordino
-        reorder_df = rules.compute_reorder(
-            df_raw,
-            start_date=start_date,
-            end_date=end_date,
-            lead_time=int(lead_time),
-            coverage=int(coverage),
-            safety=int(safety),
-        )
-
-        orders_df = reorder_df[reorder_df["qty_to_order"] > 0].copy()
+        # Filtra una sola volta le righe da ordinare: lo stesso sottoinsieme viene
+        # riutilizzato per riepilogo, anteprima ed esportazioni
+        order_mask = reorder_df["qty_to_order"].to_numpy() > 0
+        # Nessuna copia: il sottoinsieme viene solo letto, mai modificato sul posto
+        orders_df = reorder_df.loc[order_mask]
 
         # Riepilogo
         st.subheader("Riepilogo risultati")
@@ -183,28 +371,35 @@ def main() -> None:
                 "coverage_days",
                 "relevance_score",
             ]
-            # Copia il DataFrame degli ordini per l'anteprima
-            preview_df = orders_df.copy()
+            # ``sort_values`` più sotto restituisce comunque un nuovo DataFrame
+            preview_df = orders_df
             # Se la colonna relevance_score è assente per qualche motivo, calcolala al volo
             # usando la stessa formula di compute_reorder: domanda giornaliera divisa per
             # (copertura + 1). Le coperture negative o nulle vengono impostate a zero.
             if "relevance_score" not in preview_df.columns:
-                cov = preview_df.get("coverage_days").copy()
+                cov = preview_df.get("coverage_days")
                 # Se coverage_days non è presente, crea una serie di zeri della lunghezza del DF
                 if cov is None:
                     cov = pd.Series([0] * len(preview_df), index=preview_df.index)
                 # Gestisce NaN e valori negativi impostandoli a 0
-                cov = cov.fillna(0)
-                cov[cov < 0] = 0
-                # Calcola il punteggio di rilevanza: daily_demand /(coverage+1)
-                preview_df["relevance_score"] = preview_df.get("daily_demand", 0) / (cov + 1)
+                cov = cov.fillna(0).clip(lower=0)
+                # Calcola il punteggio di rilevanza: daily_demand /(coverage+1). ``assign``
+                # crea un nuovo DataFrame senza toccare ``orders_df``.
+                preview_df = preview_df.assign(
+                    relevance_score=preview_df.get("daily_demand", 0) / (cov + 1)
+                )
 
             # Ordina le righe in base alla scelta dell'utente
             if sort_by == "relevance" and "relevance_score" in preview_df.columns:
-                preview_df = preview_df.sort_values(
+                # Servono solo le prime 100 righe: ``nlargest`` le seleziona con un
+                # heap invece di ordinare tutto il DataFrame. ``keep="all"`` conserva
+                # i pari merito sul bordo, che il secondo ordinamento (sulle sole
+                # righe selezionate) dirime per codice articolo.
+                preview_df = preview_df.nlargest(100, "relevance_score", keep="all").sort_values(
                     by=["relevance_score", "product_code"], ascending=[False, True]
                 )
             else:
+                # ``nsmallest`` non supporta colonne di testo: qui resta l'ordinamento completo
                 preview_df = preview_df.sort_values(by="product_code", ascending=True)
             # Filtra solo le colonne disponibili per evitare KeyError se qualche colonna manca
             available_cols = [c for c in preview_cols if c in preview_df.columns]
@@ -214,40 +409,38 @@ def main() -> None:
 
         # Esporta i risultati completi in un workbook Excel
         st.subheader("Download report")
-        with tempfile.TemporaryDirectory() as tmpdir:
-            analysis_path = os.path.join(tmpdir, "analisi_riordino.xlsx")
-            vendor_path = os.path.join(tmpdir, "ordini_per_fornitore.xlsx")
-            vendors_csv_path = os.path.join(tmpdir, "vendors_template.csv")
-
-            reporting.generate_analysis_xlsx(reorder_df, analysis_path)
-            # Passa la modalità di ordinamento alla funzione di esportazione degli ordini
-            reporting.generate_orders_by_vendor_xlsx(
-                reorder_df, vendor_path, sort_by=sort_by
+        analysis_bytes, vendor_bytes, vendors_csv_bytes = _build_reports(
+            digest, params, sort_by, reorder_df, orders_df
+        )
+        st.download_button(
+            "Scarica workbook analisi (xlsx)",
+            analysis_bytes,
+            file_name="Analisi_riordino.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        st.download_button(
+            "Scarica ordini per fornitore (xlsx)",
+            vendor_bytes,
+            file_name="Ordini_per_fornitore.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        st.download_button(
+            "Scarica template fornitori (csv)",
+            vendors_csv_bytes,
+            file_name="vendors_template.csv",
+            mime="text/csv",
+        )
+        # Workbook unico facoltativo: generato solo su richiesta dell'utente
+        if st.checkbox(
+            "Prepara anche un workbook unico (analisi + ordini per fornitore)",
+            value=False,
+        ):
+            st.download_button(
+                "Scarica workbook unico (xlsx)",
+                _build_full_report(digest, *params, sort_by, reorder_df, orders_df),
+                file_name="Report_riordino.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
-            reporting.generate_vendors_template_csv(reorder_df, vendors_csv_path)
-
-            # Leggi i file in memoria e crea i pulsanti di download
-            with open(analysis_path, "rb") as f:
-                st.download_button(
-                    "Scarica workbook analisi (xlsx)",
-                    f,
-                    file_name="Analisi_riordino.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-            with open(vendor_path, "rb") as f:
-                st.download_button(
-                    "Scarica ordini per fornitore (xlsx)",
-                    f,
-                    file_name="Ordini_per_fornitore.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-            with open(vendors_csv_path, "rb") as f:
-                st.download_button(
-                    "Scarica template fornitori (csv)",
-                    f,
-                    file_name="vendors_template.csv",
-                    mime="text/csv",
-                )
 
 
 if __name__ == "__main__":